@@ -1,52 +1,140 @@
 from trader import BTCTrader
+import asyncio
+import json
+import logging
+import logging.handlers
+import queue
+import signal
 import time
-from datetime import datetime
 
-def main():
-    trader = BTCTrader()
-    position = False
-    
-    print("Starting BTC trading bot...")
-    print("Waiting for signals...")
-    
-    while True:
-        try:
-            current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            signal = trader.check_supertrend()
-            
-            if signal is None:
-                print(f"[{current_time}] Error getting signal, waiting for next check...")
-                time.sleep(20)
+import websockets
+
+logger = logging.getLogger(__name__)
+
+MARKETDATA_WS_URL = "wss://trading.robinhood.com/ws/marketdata/"
+CANDLE_CHANNEL = "candles_5m"
+CANDLE_SECONDS = 300
+# Wake just after the candle closes so the fallback polls a fresh value
+CANDLE_CLOSE_JITTER = 0.2
+
+def setup_logging():
+    """Funnel all records through a queue to a background listener.
+
+    Formatting and the stdout write happen on the listener thread, so
+    logging never blocks the event loop mid-tick.
+    """
+    log_queue = queue.Queue(-1)
+    root = logging.getLogger()
+    root.setLevel(logging.INFO)
+    root.addHandler(logging.handlers.QueueHandler(log_queue))
+
+    stream = logging.StreamHandler()
+    stream.setFormatter(logging.Formatter(
+        "[%(asctime)s] %(message)s", datefmt="%Y-%m-%d %H:%M:%S"
+    ))
+    listener = logging.handlers.QueueListener(log_queue, stream)
+    listener.start()
+    return listener
+
+async def execute_signal(trader, trade_signal, state):
+    """Act on a BUY/SELL signal, updating state['position']."""
+    # One gathered state fetch per tick; the order calls reuse it
+    snap = await trader.snapshot()
+
+    if trade_signal == "BUY" and not state["position"]:
+        logger.info("💰 Executing BUY order...")
+        result = await trader.buy_BTC(10, price=snap.price)
+        if result:
+            state["position"] = True
+            logger.info("✅ BUY order executed")
+        else:
+            logger.info("❌ BUY order failed")
+    elif trade_signal == "SELL" and state["position"]:
+        logger.info("💰 Executing SELL order...")
+        result = await trader.sell_BTC(holdings=snap.holdings)
+        if result:
+            state["position"] = False
+            logger.info("✅ SELL order executed")
+        else:
+            logger.info("❌ SELL order failed")
+
+async def stream_signals(trader, state):
+    """Subscribe to the market-data stream and trade on closed candles."""
+    async with websockets.connect(MARKETDATA_WS_URL) as ws:
+        await ws.send(json.dumps({
+            "action": "subscribe",
+            "symbols": [trader.symbol],
+            "channels": ["best_bid_ask", CANDLE_CHANNEL],
+        }))
+        logger.info("Subscribed to %s market data", trader.symbol)
+
+        async for raw in ws:
+            message = json.loads(raw)
+            if message.get("channel") != CANDLE_CHANNEL or not message.get("closed"):
                 continue
-                
-            if signal == "BUY" and not position:
-                print(f"[{current_time}] 💰 Executing BUY order...")
-                result = trader.buy_BTC(10)
-                if result:
-                    position = True
-                    print(f"[{current_time}] ✅ BUY order executed")
-                else:
-                    print(f"[{current_time}] ❌ BUY order failed")
-            elif signal == "SELL" and position:
-                print(f"[{current_time}] 💰 Executing SELL order...")
-                result = trader.sell_BTC()
-                if result:
-                    position = False
-                    print(f"[{current_time}] ✅ SELL order executed")
-                else:
-                    print(f"[{current_time}] ❌ SELL order failed")
-            
-            time.sleep(20)
-            
-        except KeyboardInterrupt:
-            print("\nBot stopped by user")
-            if position:
-                print("Closing position before exiting...")
-                trader.sell_BTC()
+
+            trade_signal = trader.update_supertrend(message["candle"])
+            if trade_signal:
+                await execute_signal(trader, trade_signal, state)
+
+async def wait_for_shutdown(shutdown, seconds):
+    """Sleep up to `seconds`, returning early if shutdown is requested."""
+    try:
+        await asyncio.wait_for(shutdown.wait(), timeout=seconds)
+    except asyncio.TimeoutError:
+        pass
+
+async def main_async():
+    trader = BTCTrader()
+    state = {"position": False}
+    shutdown = asyncio.Event()
+
+    # SIGTERM (systemd/docker stop) never becomes KeyboardInterrupt, so
+    # route both it and Ctrl-C through one shutdown event; this also makes
+    # the sleeps below interruptible instead of blocking up to a candle
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(signum, shutdown.set)
+
+    logger.info("Starting BTC trading bot...")
+    logger.info("Waiting for signals...")
+
+    while not shutdown.is_set():
+        stream_task = asyncio.create_task(stream_signals(trader, state))
+        shutdown_task = asyncio.create_task(shutdown.wait())
+        done, pending = await asyncio.wait(
+            {stream_task, shutdown_task}, return_when=asyncio.FIRST_COMPLETED
+        )
+        for task in pending:
+            task.cancel()
+
+        if shutdown.is_set():
             break
+
+        try:
+            stream_task.result()
         except Exception as e:
-            print(f"[{current_time}] Error: {e}")
-            time.sleep(20)
+            logger.error("Stream error: %s, falling back to REST poll", e)
+            trade_signal = await trader.check_supertrend()
+            if trade_signal:
+                await execute_signal(trader, trade_signal, state)
+            # Sleep until the next candle close instead of a fixed 20s,
+            # so polls don't drift and check stale mid-candle values
+            next_wake = (time.time() // CANDLE_SECONDS + 1) * CANDLE_SECONDS + CANDLE_CLOSE_JITTER
+            await wait_for_shutdown(shutdown, max(0, next_wake - time.time()))
+
+    logger.info("Bot stopped")
+    if state["position"]:
+        logger.info("Closing position before exiting...")
+        await trader.sell_BTC()
+    await trader.aclose()
+
+def main():
+    listener = setup_logging()
+    try:
+        asyncio.run(main_async())
+    finally:
+        listener.stop()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -1,72 +1,328 @@
+import asyncio
 import base64
-import datetime
-import json
+import logging
 import os
-import uuid
-from nacl.signing import SigningKey
-import requests
-from dotenv import load_dotenv
-from tradingview_ta import TA_Handler
+import random
+import time
+from collections import deque, namedtuple
+from urllib.parse import urlencode
+from cryptography.hazmat.primitives.asymmetric.ed25519 import Ed25519PrivateKey
+import httpx
+import numpy as np
+import orjson
 
-load_dotenv()
+# Under systemd/docker the credentials are already in the environment;
+# only pay the .env file parse when they are not
+if not os.getenv('RH_API_KEY'):
+    from dotenv import load_dotenv
+    load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+SUPERTREND_PERIOD = 7
+SUPERTREND_MULTIPLIER = 3
+PRICE_CACHE_TTL = 0.5
+API_CACHE_TTL = 0.5
+
+PATH_HOLDINGS = "/api/v1/crypto/trading/holdings/"
+PATH_BEST_BID_ASK = "/api/v1/crypto/marketdata/best_bid_ask/"
+PATH_ORDERS = "/api/v1/crypto/trading/orders/"
+
+# Point-in-time account state fetched once per strategy tick
+Snapshot = namedtuple("Snapshot", ["price", "holdings"])
+
+_supertrend_kernel = None
+
+def supertrend_full(high, low, close, period, multiplier):
+    """Recompute Supertrend over full candle history in one compiled pass.
+
+    Used for warm start/recovery only; steady state uses the O(1)
+    update_supertrend. The numba kernel is compiled on first use so
+    importing this module doesn't pay the numba import + JIT cost.
+    Returns (signal_line, trend_dir, final_state) where final_state is
+    [atr, final_upper, final_lower] for seeding the incremental updater.
+    """
+    global _supertrend_kernel
+    if _supertrend_kernel is None:
+        from numba import njit
+        _supertrend_kernel = njit(cache=True)(_supertrend_full_py)
+    return _supertrend_kernel(high, low, close, period, multiplier)
+
+def _supertrend_full_py(high, low, close, period, multiplier):
+    n = close.shape[0]
+    signal_line = np.full(n, np.nan)
+    trend_dir = np.zeros(n)
+    atr = 0.0
+    final_upper = np.inf
+    final_lower = -np.inf
+    trend = 0.0
+
+    for i in range(1, n):
+        true_range = max(high[i] - low[i],
+                         abs(high[i] - close[i - 1]),
+                         abs(low[i] - close[i - 1]))
+        if i < period:
+            atr += true_range
+            continue
+        if i == period:
+            atr = (atr + true_range) / period
+        else:
+            atr = (atr * (period - 1) + true_range) / period
+
+        hl2 = (high[i] + low[i]) / 2
+        basic_upper = hl2 + multiplier * atr
+        basic_lower = hl2 - multiplier * atr
+
+        if basic_upper < final_upper or close[i - 1] > final_upper:
+            final_upper = basic_upper
+        if basic_lower > final_lower or close[i - 1] < final_lower:
+            final_lower = basic_lower
+
+        if close[i] > final_upper:
+            trend = 1.0
+        elif close[i] < final_lower:
+            trend = -1.0
+
+        trend_dir[i] = trend
+        signal_line[i] = final_lower if trend == 1.0 else final_upper
+
+    final_state = np.array([atr, final_upper, final_lower])
+    return signal_line, trend_dir, final_state
 
 class BTCTrader:
-    def __init__(self):
+    """Robinhood crypto trader, generic over the traded pair.
+
+    Defaults to BTC-USD; pass symbol/asset_code to trade another pair
+    instead of duplicating the class per asset.
+    """
+
+    # Shared across instances so traders for several pairs multiplex one
+    # keep-alive pool instead of each opening their own connections
+    _shared_client = None
+
+    def __init__(self, symbol="BTC-USD", asset_code="BTC"):
         self.api_key = os.getenv('RH_API_KEY')
         private_key = os.getenv('RH_PRIVATE_KEY')
-        
+
         if not self.api_key or not private_key:
             raise ValueError("Missing API credentials in environment variables.")
-            
+
         private_key_seed = base64.b64decode(private_key)
-        self.private_key = SigningKey(private_key_seed)
+        self.private_key = Ed25519PrivateKey.from_private_bytes(private_key_seed)
+        # Pre-bound methods skip two attribute lookups per signed request
+        self._sign = self.private_key.sign
+        self._b64encode = base64.b64encode
+        self._api_key_bytes = self.api_key.encode()
+        # Shallow-copied per call; only signature and timestamp vary
+        self._headers_template = {
+            "x-api-key": self.api_key,
+            "x-signature": "",
+            "x-timestamp": ""
+        }
+        # Signing-message suffixes for body-less endpoints; the timestamp
+        # sits between api_key and path, so everything after it is constant
+        self._sign_suffix_cache = {}
+        # (method, path) -> (timestamp, signature) for same-second bursts
+        self._sig_cache = {}
         self.base_url = "https://trading.robinhood.com"
-        self.symbol = "BTC-USD"
+        self.symbol = symbol
+        self.asset_code = asset_code
+        # Fixed query paths built once; also keeps the signed path and the
+        # requested path from ever drifting apart
+        self._price_path = f"{PATH_BEST_BID_ASK}?{urlencode({'symbol': symbol})}"
+        self._holdings_path = f"{PATH_HOLDINGS}?{urlencode({'asset_code': asset_code})}"
+
+        # One pooled HTTP/2 client so keep-alive amortizes the TLS
+        # handshake and concurrent calls multiplex over one connection;
+        # transport retries re-dial transient connect failures
+        if BTCTrader._shared_client is None:
+            BTCTrader._shared_client = httpx.AsyncClient(
+                base_url=self.base_url,
+                timeout=10.0,
+                headers={"Content-Type": "application/json"},
+                transport=httpx.AsyncHTTPTransport(
+                    http2=True,
+                    retries=2,
+                    limits=httpx.Limits(max_keepalive_connections=8, max_connections=16)
+                )
+            )
+        self._client = BTCTrader._shared_client
+
+        # Seeded once from urandom; order ids then come from the fast PRNG
+        # instead of a /dev/urandom read + uuid.UUID parse per order
+        self._rng = random.Random(os.urandom(16))
+
+        # symbol -> (monotonic fetch time, price); see prefetch_prices
+        self._price_cache = {}
+        self._price_cache_hits = 0
+        self._price_cache_misses = 0
+
+        # Specialized senders for the order shapes this bot actually uses
+        self._send_market_buy = self._make_order_sender("buy", "market")
+        self._send_market_sell = self._make_order_sender("sell", "market")
+        # (method, path) -> (monotonic fetch time, response) for GETs
+        self._get_cache = {}
+
+        # Streaming Supertrend state: Wilder ATR and the clamped bands are
+        # carried across calls so each closed candle is an O(1) update
+        self._candles = deque(maxlen=SUPERTREND_PERIOD * 3)
+        self._prev_close = None
+        self._prev_atr = None
+        self._tr_seed = []
+        self._st_upper = None
+        self._st_lower = None
+        self._st_trend = None
+
+    async def aclose(self):
+        """Close the shared HTTP client; call once at process shutdown."""
+        if BTCTrader._shared_client is not None:
+            await BTCTrader._shared_client.aclose()
+            BTCTrader._shared_client = None
 
     def _get_headers(self, method: str, path: str, body: str = ""):
-        timestamp = int(datetime.datetime.now(tz=datetime.timezone.utc).timestamp())
-        message = f"{self.api_key}{timestamp}{path}{method}{body}"
-        signed = self.private_key.sign(message.encode("utf-8"))
-        
-        return {
-            "x-api-key": self.api_key,
-            "x-signature": base64.b64encode(signed.signature).decode("utf-8"),
-            "x-timestamp": str(timestamp)
+        timestamp = str(int(time.time()))
+        # Build the signing message from pre-encoded fragments; no f-string
+        # formatting plus a second encode pass on every call. GET endpoints
+        # have a constant path+method+empty-body tail, so encode it once.
+        if not body:
+            suffix = self._sign_suffix_cache.get((method, path))
+            if suffix is None:
+                suffix = path.encode() + method.encode()
+                self._sign_suffix_cache[(method, path)] = suffix
+            # Gathered GETs landing within the same second sign an identical
+            # message, so reuse the signature instead of re-running Ed25519
+            cached = self._sig_cache.get((method, path))
+            if cached is not None and cached[0] == timestamp:
+                signature_b64 = cached[1]
+            else:
+                message = b"".join([self._api_key_bytes, timestamp.encode(), suffix])
+                signature_b64 = self._b64encode(self._sign(message)).decode("utf-8")
+                self._sig_cache[(method, path)] = (timestamp, signature_b64)
+        else:
+            suffix = path.encode() + method.encode() + (body if isinstance(body, bytes) else body.encode())
+            message = b"".join([self._api_key_bytes, timestamp.encode(), suffix])
+            signature_b64 = self._b64encode(self._sign(message)).decode("utf-8")
+
+        headers = self._headers_template.copy()
+        headers["x-signature"] = signature_b64
+        headers["x-timestamp"] = timestamp
+        return headers
+
+    def _make_order_sender(self, side, order_type):
+        """Build a specialized sender for one (side, order type) pair.
+
+        The body skeleton with the constant fields is built once here and
+        mutated in place per order — it is serialized before send returns,
+        so no copy is needed and no dict is allocated on the order path.
+        """
+        config_key = f"{order_type}_order_config"
+        skeleton = {
+            "client_order_id": "",
+            "symbol": self.symbol,
+            "side": side,
+            "type": order_type,
+            config_key: None
         }
 
-    def get_holdings(self):
-        """Get BTC holdings."""
-        path = "/api/v1/crypto/trading/holdings/?asset_code=BTC"
-        response = requests.get(
-            self.base_url + path,
-            headers=self._get_headers("GET", path),
-            timeout=10
-        )
-        return response.json()
-    
-    def get_price(self):
-        """Get current DOGE price."""
-        path = f"/api/v1/crypto/marketdata/best_bid_ask/?symbol={self.symbol}"
-        response = requests.get(
-            self.base_url + path,
-            headers=self._get_headers("GET", path),
-            timeout=10
+        async def send(order_config):
+            skeleton["client_order_id"] = self._next_client_order_id()
+            skeleton[config_key] = order_config
+            return await self._make_api_request("POST", PATH_ORDERS, orjson.dumps(skeleton))
+
+        return send
+
+    def _next_client_order_id(self):
+        """Generate a UUID4-format order id without the uuid module pipeline.
+
+        Robinhood requires client_order_id in canonical UUID form, so keep
+        the 8-4-4-4-12 layout and the version/variant bits.
+        """
+        bits = self._rng.getrandbits(128)
+        bits = (bits & ~(0xF << 76)) | (0x4 << 76)
+        bits = (bits & ~(0x3 << 62)) | (0x2 << 62)
+        hex32 = f"{bits:032x}"
+        return f"{hex32[:8]}-{hex32[8:12]}-{hex32[12:16]}-{hex32[16:20]}-{hex32[20:]}"
+
+    async def _make_api_request(self, method: str, path: str, body: str = ""):
+        """Issue a signed request on the pooled client."""
+        if method == "GET":
+            # Duplicate reads within one tick come out of the cache; an
+            # order POST below invalidates it so fills are seen at once
+            cached = self._get_cache.get(path)
+            now = time.monotonic()
+            if cached and now - cached[0] < API_CACHE_TTL:
+                return cached[1]
+            response = await self._client.get(path, headers=self._get_headers("GET", path))
+            self._get_cache[path] = (now, response)
+            return response
+        self._get_cache.clear()
+        # Send the exact bytes that were signed; no json.loads + re-dump pass
+        return await self._client.post(
+            path,
+            headers=self._get_headers("POST", path, body),
+            content=body.encode("utf-8") if isinstance(body, str) else body
         )
-        result = response.json()
-        
+
+    async def get_holdings(self):
+        """Get holdings for the traded asset."""
+        return orjson.loads((await self._make_api_request("GET", self._holdings_path)).content)
+
+    async def prefetch_prices(self, symbols):
+        """Fetch best bid/ask for several symbols in one round-trip.
+
+        Quotes land in the price cache, so get_price calls within the TTL
+        are served from memory instead of one request per symbol.
+        """
+        # urlencode also escapes symbols correctly, unlike the raw join
+        path = f"{PATH_BEST_BID_ASK}?{urlencode([('symbol', symbol) for symbol in symbols])}"
+        result = orjson.loads((await self._make_api_request("GET", path)).content)
+
+        prices = {}
+        if result and 'results' in result:
+            now = time.monotonic()
+            for quote in result['results']:
+                price = float(quote['price'])
+                self._price_cache[quote['symbol']] = (now, price)
+                prices[quote['symbol']] = price
+        return prices
+
+    async def get_price(self):
+        """Get the current price for the traded symbol."""
+        cached = self._price_cache.get(self.symbol)
+        if cached and time.monotonic() - cached[0] < PRICE_CACHE_TTL:
+            self._price_cache_hits += 1
+            return cached[1]
+        self._price_cache_misses += 1
+
+        result = orjson.loads((await self._make_api_request("GET", self._price_path)).content)
+
         if result and 'results' in result and result['results']:
             price = float(result['results'][0]['price'])
-            print(f"DOGE: ${price:.4f}")
+            self._price_cache[self.symbol] = (time.monotonic(), price)
+            logger.info("%s: $%.4f", self.asset_code, price)
             return price
 
 
 
-    def buy_BTC(self, dollars: float):
-        """Buy BTC with USD."""
-        # Get current price first
-        current_price = self.get_price()
+    async def snapshot(self):
+        """Fetch the quote and holdings concurrently for one strategy tick.
+
+        Gives a consistent point-in-time view and amortizes the two reads
+        into one gather; pass the result into buy_BTC/sell_BTC so they
+        skip their internal fetches.
+        """
+        price, holdings = await asyncio.gather(self.get_price(), self.get_holdings())
+        return Snapshot(price, holdings)
+
+    def invalidate_price(self):
+        """Drop cached quotes so the next read is fresh, e.g. after a fill."""
+        self._price_cache.clear()
+
+    async def buy_BTC(self, dollars: float, price=None):
+        """Buy BTC with USD; pass a snapshot price to skip the quote read."""
+        current_price = price if price is not None else await self.get_price()
         if not current_price:
-            print("Could not get current price")
+            logger.error("Could not get current price")
             return None
             
         # Calculate quantity in BTC
@@ -74,105 +330,174 @@ class BTCTrader:
         
         # Check minimum order size (0.000001 BTC)
         if quantity < 0.000001:
-            print(f"Order too small. Minimum order is 0.000001 BTC (${0.000001 * current_price:.2f})")
+            logger.info("Order too small. Minimum order is 0.000001 BTC ($%.2f)", 0.000001 * current_price)
             return None
 
-        # Prepare order data
-        order_data = {
-            "client_order_id": str(uuid.uuid4()),
-            "symbol": self.symbol,
-            "side": "buy",
-            "type": "market",
-            "market_order_config": {
-                "asset_quantity": f"{quantity:.6f}"  # Format with 6 decimal places
-            }
-        }
-        
-        # Place order
-        body = json.dumps(order_data)
         try:
-            response = requests.post(
-                self.base_url + "/api/v1/crypto/trading/orders/",
-                headers=self._get_headers("POST", "/api/v1/crypto/trading/orders/", body),
-                json=order_data,
-                timeout=10
-            )
-            
+            response = await self._send_market_buy({
+                "asset_quantity": f"{quantity:.6f}"  # Format with 6 decimal places
+            })
+
+
             if response.status_code == 201:
-                print(f"Bought {quantity:.6f} BTC at ~${current_price:.2f}")
-                return response.json()
+                self.invalidate_price()
+                logger.info("Bought %.6f BTC at ~$%.2f", quantity, current_price)
+                return orjson.loads(response.content)
             else:
-                print(f"Order failed: {response.text}")
+                # %s-style args defer formatting until a handler wants it
+                logger.error("Order failed %d: %s", response.status_code, response.text)
                 return None
         except Exception as e:
-            print(f"Error: {e}")
+            logger.error("Order error: %s", e)
             return None
 
-    def sell_BTC(self):
-        """Sell all BTC."""
-        holdings = self.get_holdings()
+    async def sell_BTC(self, holdings=None):
+        """Sell all BTC; pass snapshot holdings to skip the fetch."""
+        if holdings is None:
+            holdings = await self.get_holdings()
 
         if holdings and 'results' in holdings and holdings['results']:
             quantity = holdings['results'][0].get('quantity_available_for_trading', '0')
             if float(quantity) > 0:
-                path = "/api/v1/crypto/trading/orders/"
-                body = json.dumps({
-                    "client_order_id": str(uuid.uuid4()),
-                    "symbol": self.symbol,
-                    "side": "sell",
-                    "type": "market",
-                    "market_order_config": {
-                        "asset_quantity": str(quantity)
-                    }
+                response = await self._send_market_sell({
+                    "asset_quantity": str(quantity)
                 })
-                response = requests.post(
-                    self.base_url + path,
-                    headers=self._get_headers("POST", path, body),
-                    json=json.loads(body),
-                    timeout=10
-                )
-                print("Sold all BTC")
-                return response.json()
+                self.invalidate_price()
+                logger.info("Sold all BTC")
+                return orjson.loads(response.content)
             
-    def check_supertrend(self):
+    async def check_supertrend(self):
         """Check BTC Supertrend signal using TAAPI.IO API."""
         try:
             taapi_key = os.getenv('TAAPI_API_KEY')
             if not taapi_key:
                 raise ValueError("Missing TAAPI API key in environment variables.")
 
-            url = "https://api.taapi.io/supertrend"
-            
-            params = {
+            # One /bulk POST returns every requested indicator in a single
+            # round-trip; additional indicators are one more entry here
+            # instead of another request
+            url = "https://api.taapi.io/bulk"
+            payload = {
                 'secret': taapi_key,
-                'exchange': 'binance',
-                'symbol': 'BTC/USDT',
-                'interval': '15m',
-                'period': 7,  
-                'multiplier': 3  
+                'construct': {
+                    'exchange': 'binance',
+                    'symbol': f'{self.asset_code}/USDT',
+                    'interval': '15m',
+                    'indicators': [
+                        {
+                            'id': 'supertrend',
+                            'indicator': 'supertrend',
+                            'period': SUPERTREND_PERIOD,
+                            'multiplier': SUPERTREND_MULTIPLIER
+                        }
+                    ]
+                }
             }
 
-            response = requests.get(url, params=params, timeout=10)
+            # The indicator fetch and the quote are independent; run them
+            # concurrently so the check costs max() not sum() of the RTTs
+            response, current_price = await asyncio.gather(
+                self._client.post(url, content=orjson.dumps(payload)),
+                self.get_price()
+            )
             response.raise_for_status()
-            data = response.json()
-
-            current_price = self.get_price()
+            results = {item['id']: item['result'] for item in orjson.loads(response.content)['data']}
+            data = results['supertrend']
 
             if data['valueAdvice'] == 'long':
-                print(f"BTC: ${current_price:.2f} | Signal: BUY (Supertrend: ${data['value']:.2f})")
+                logger.info("%s: $%.2f | Signal: BUY (Supertrend: $%.2f)", self.asset_code, current_price, data['value'])
                 return "BUY"
             else:
-                print(f"BTC: ${current_price:.2f} | Signal: SELL (Supertrend: ${data['value']:.2f})")
+                logger.info("%s: $%.2f | Signal: SELL (Supertrend: $%.2f)", self.asset_code, current_price, data['value'])
                 return "SELL"
 
-        except requests.RequestException as e:
-            print(f"API request failed: {e}")
+        except httpx.HTTPError as e:
+            logger.error("API request failed: %s", e)
             return None
         except KeyError as e:
-            print(f"Invalid API response format: {e}")
+            logger.error("Invalid API response format: %s", e)
             return None
         except Exception as e:
-            print(f"Error: {e}")
+            logger.error("Error: %s", e)
             return None
-            
-    
\ No newline at end of file
+
+    def seed_supertrend(self, candles):
+        """Warm-start the incremental Supertrend from candle history.
+
+        Runs the compiled supertrend_full over the history (a list of
+        dicts with 'high'/'low'/'close'), then seeds the carried state so
+        update_supertrend continues incrementally from the last candle.
+        Returns "BUY"/"SELL" for the seeded trend, else None.
+        """
+        if len(candles) <= SUPERTREND_PERIOD:
+            return None
+
+        high = np.array([float(c['high']) for c in candles])
+        low = np.array([float(c['low']) for c in candles])
+        close = np.array([float(c['close']) for c in candles])
+        _, trend_dir, final_state = supertrend_full(
+            high, low, close, SUPERTREND_PERIOD, SUPERTREND_MULTIPLIER
+        )
+
+        self._candles.clear()
+        self._candles.extend(zip(high[-self._candles.maxlen:],
+                                 low[-self._candles.maxlen:],
+                                 close[-self._candles.maxlen:]))
+        self._prev_close = close[-1]
+        self._prev_atr = final_state[0]
+        self._st_upper = final_state[1]
+        self._st_lower = final_state[2]
+        self._tr_seed = []
+
+        if trend_dir[-1] == 0:
+            self._st_trend = None
+            return None
+        self._st_trend = 1 if trend_dir[-1] > 0 else -1
+        return "BUY" if self._st_trend == 1 else "SELL"
+
+    def update_supertrend(self, candle):
+        """Update Supertrend in O(1) from a closed candle.
+
+        Only the newest candle's true range is folded into the carried
+        Wilder ATR, instead of recomputing over the whole window. Returns
+        "BUY"/"SELL" once the ATR is seeded, else None.
+        """
+        high = float(candle['high'])
+        low = float(candle['low'])
+        close = float(candle['close'])
+        self._candles.append((high, low, close))
+
+        prev_close = self._prev_close
+        self._prev_close = close
+        if prev_close is None:
+            return None
+
+        true_range = max(high - low, abs(high - prev_close), abs(low - prev_close))
+        if self._prev_atr is None:
+            # Seed the ATR with a simple average of the first period TRs
+            self._tr_seed.append(true_range)
+            if len(self._tr_seed) < SUPERTREND_PERIOD:
+                return None
+            atr = sum(self._tr_seed) / SUPERTREND_PERIOD
+        else:
+            atr = (self._prev_atr * (SUPERTREND_PERIOD - 1) + true_range) / SUPERTREND_PERIOD
+        self._prev_atr = atr
+
+        hl2 = (high + low) / 2
+        basic_upper = hl2 + SUPERTREND_MULTIPLIER * atr
+        basic_lower = hl2 - SUPERTREND_MULTIPLIER * atr
+
+        # Clamp the bands so they only tighten while the trend holds
+        if self._st_upper is None or basic_upper < self._st_upper or prev_close > self._st_upper:
+            self._st_upper = basic_upper
+        if self._st_lower is None or basic_lower > self._st_lower or prev_close < self._st_lower:
+            self._st_lower = basic_lower
+
+        if close > self._st_upper:
+            self._st_trend = 1
+        elif close < self._st_lower:
+            self._st_trend = -1
+        elif self._st_trend is None:
+            return None
+
+        return "BUY" if self._st_trend == 1 else "SELL"